@@ -1,57 +1,131 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, make_response, abort
 import os
-import cv2
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
 import threading
 import time
 from datetime import datetime
 
-# Import your existing modules
-from src.detector import VehicleDetector
-from src.tracker import VehicleTracker
-from src.speed_estimator import SpeedEstimator
-from src.violation import ViolationChecker
+# Import your existing modules (lightweight only; the OpenCV/YOLO pipeline
+# is imported inside process_video_background so the server starts instantly)
 from src.database import Database
+from src.response_cache import ResponseCache
+from src.image_cache import ThumbnailCache, THUMBNAIL_SIZES
+from src.streaming import UploadState, is_streamable
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Epilogue, Field, File, Data
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'mp4', 'avi', 'mov', 'mkv'}
+app.config['GEOMETRY_PATH'] = 'config/camera_geometry.json'  # Stop line / zones for the camera
+app.config['DEDUP_WINDOW'] = 300  # Seconds before the same vehicle ID can be recorded again
+app.config['IMAGE_FOLDER'] = 'outputs/images'
+app.config['THUMBNAIL_FOLDER'] = 'outputs/thumbnails'
+app.config['THUMBNAIL_CACHE_BYTES'] = 200 * 1024 * 1024  # 200MB on-disk cap for derivatives
+app.config['IMAGE_MAX_AGE'] = 365 * 24 * 3600  # Evidence images never change once written
+app.config['UPLOAD_CHUNK_SIZE'] = 1024 * 1024  # Bytes read from the request per write
+app.config['STREAM_START_BYTES'] = 2 * 1024 * 1024  # Start analysing streamable uploads after this much
+app.config['FRAME_STRIDE'] = 1  # Analyse every Nth frame; skipped frames are grabbed, not decoded to BGR
+app.config['DEFAULT_FPS'] = 25  # Used when the video does not report a frame rate
+app.config['PROCESS_SIZE'] = None  # (width, height) to downscale frames to at decode time, None = source size
 
 # Ensure folders exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('outputs/images', exist_ok=True)
+os.makedirs('database', exist_ok=True)
+
+# Shared database handle and rendered-page cache for the read-only views
+db = Database(db_path="database/violations.db")
+page_cache = ResponseCache(max_entries=128)
+thumbnails = ThumbnailCache(app.config['THUMBNAIL_FOLDER'], max_bytes=app.config['THUMBNAIL_CACHE_BYTES'])
 
 # Global variables for processing status
 processing_status = {
     'is_processing': False,
-    'progress': 0,
+    'is_uploading': False,
+    'upload_progress': 0,
+    'bytes_received': 0,
+    'total_bytes': 0,
+    'progress': 0,  # Analysis progress
     'current_video': None,
     'total_frames': 0,
     'processed_frames': 0,
-    'violations_found': 0
+    'violations_found': 0,
+    'evicted_tracks': 0
 }
 
+def cached_page(key, render):
+    """
+    Serve a rendered page from cache while the DB change counter is unchanged.
+    Sends an ETag so browsers revalidate with If-None-Match and get a 304.
+    """
+    version = db.get_version()
+    etag = f"{key}-{version}"
+    
+    # Client already has this version: answer before touching the cache or rendering
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        body = page_cache.get(key, version)
+        if body is None:
+            body = render()
+            page_cache.put(key, version, body)
+        response = make_response(body)
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate
+    return response
+
+@app.template_filter('image_url')
+def image_url(image_path, size='small'):
+    """Map a stored evidence path to its /images URL, e.g. {{ v.image_path | image_url('medium') }}"""
+    if not image_path or not image_path.lower().endswith('.jpg'):
+        return ''
+    return url_for('evidence_image', filename=os.path.basename(image_path), size=size)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def process_video_background(video_path, video_id):
-    """Process video in background thread"""
+def process_video_background(video_path, video_id, upload=None):
+    """
+    Process video in background thread.
+    With an UploadState the file is still being written and is decoded as it grows.
+    """
     global processing_status
+    analytics = None
     
     try:
         processing_status['is_processing'] = True
         processing_status['progress'] = 0
         
+        import cv2
+        from src.detector import VehicleDetector
+        from src.tracker import VehicleTracker
+        from src.speed_estimator import SpeedEstimator
+        from src.violation import ViolationChecker
+        from src.zones import CameraGeometry
+        from src.analytics import TrafficAnalytics
+        from src.streaming import GrowingVideoCapture
+        from src.video_reader import FrameReader
+        
         # Initialize components
         detector = VehicleDetector(r"D:\Traffic Light System\models\yolov8n.pt")
         tracker = VehicleTracker()
-        violation_checker = ViolationChecker(save_dir="outputs/images")
-        db = Database(db_path="database/violations.db")
         
         # Open video
-        cap = cv2.VideoCapture(video_path)
+        source = GrowingVideoCapture(video_path, upload) if upload else cv2.VideoCapture(video_path)
+        cap = FrameReader(source, size=app.config['PROCESS_SIZE'], stride=app.config['FRAME_STRIDE'])
         fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0:
+            fps = app.config['DEFAULT_FPS']
+        
+        # Geometry is scaled from its reference size to the frames we actually process
+        frame_size = app.config['PROCESS_SIZE'] or (
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        geometry_path = app.config['GEOMETRY_PATH']
+        geometry = CameraGeometry.from_json(geometry_path, frame_size=frame_size) if os.path.exists(geometry_path) else None
+        violation_checker = ViolationChecker(save_dir="outputs/images", geometry=geometry,
+                                             capture_window=app.config['DEDUP_WINDOW'])
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         processing_status['total_frames'] = total_frames
         
@@ -65,7 +139,8 @@ def process_video_background(video_path, video_id):
         from src.traffic_light import TrafficLight
         light = TrafficLight()
         
-        recorded_violations = set()
+        analytics = TrafficAnalytics(db, video_id=video_id, bucket_seconds=60)
+        start_time = time.time()
         frame_count = 0
         
         while cap.isOpened():
@@ -73,20 +148,28 @@ def process_video_background(video_path, video_id):
             if not ret:
                 break
             
-            frame_count += 1
+            # Count source frames, including any skipped by FRAME_STRIDE
+            frame_count = cap.frame_index
+            if upload and total_frames <= 0:
+                # Frame count may only be known once more of the file has arrived
+                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                processing_status['total_frames'] = total_frames
             processing_status['processed_frames'] = frame_count
-            processing_status['progress'] = int((frame_count / total_frames) * 100)
+            if total_frames > 0:
+                processing_status['progress'] = min(int((frame_count / total_frames) * 100), 99)
             
             # Process frame
             detections = detector.detect_vehicles(frame)
             tracked_objects = tracker.update(detections)
-            speeds = speed_estimator.estimate(tracked_objects)
-            violations = violation_checker.check(frame, tracked_objects, speeds, light.get_state())
+            frame_time = frame_count / fps
+            speeds = speed_estimator.estimate(tracked_objects, timestamp=frame_time)
+            analytics.update(tracked_objects, speeds, start_time + frame_time)
+            violations = violation_checker.check(frame, tracked_objects, speeds, light.get_state(), now=frame_time)
             
-            # Save violations
+            # Save violations (first capture of each vehicle within the dedup window)
             for violation in violations:
                 obj_id = violation["vehicle_id"]
-                if obj_id not in recorded_violations:
+                if violation["new"]:
                     db.insert_violation(
                         vehicle_id=obj_id,
                         vehicle_type=violation["vehicle_type"],
@@ -95,10 +178,15 @@ def process_video_background(video_path, video_id):
                         image_path=violation["image"],
                         video_id=video_id  # Track which video
                     )
-                    recorded_violations.add(obj_id)
                     processing_status['violations_found'] += 1
+            
+            captured = violation_checker.violation_captured.stats()
+            processing_status['evicted_tracks'] = captured['evicted_expired'] + captured['evicted_lru']
         
         cap.release()
+        # An aborted upload ends the stream like a normal EOF; report it as a failure
+        if upload is not None and upload.error is not None:
+            raise RuntimeError(f"upload aborted: {upload.error}")
         processing_status['progress'] = 100
         
     except Exception as e:
@@ -106,6 +194,14 @@ def process_video_background(video_path, video_id):
         processing_status['progress'] = -1  # Error state
     
     finally:
+        # Write rollups even after a failure, so they cover the same frames
+        # as the violations already inserted
+        if analytics is not None:
+            try:
+                analytics.close()
+            except Exception as e:
+                print(f"Error saving traffic analytics: {e}")
+                processing_status['progress'] = -1
         processing_status['is_processing'] = False
 
 @app.route('/')
@@ -115,38 +211,101 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
-    """Handle video upload"""
-    if 'video' not in request.files:
+    """
+    Handle video upload.
+    The multipart body is streamed to disk in chunks; streamable containers
+    start processing while the rest of the file is still arriving.
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
         return jsonify({'error': 'No video file'}), 400
     
-    file = request.files['video']
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    video_id = timestamp
+    upload = UploadState(total_bytes=request.content_length)
+    decoder = MultipartDecoder(boundary.encode())
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
     
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+    processing_status['is_uploading'] = True
+    processing_status['upload_progress'] = 0
+    processing_status['bytes_received'] = 0
+    processing_status['total_bytes'] = request.content_length or 0
     
-    if file and allowed_file(file.filename):
-        # Create unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = secure_filename(f"{timestamp}_{file.filename}")
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Start processing in background
-        video_id = timestamp
+    filename = None
+    filepath = None
+    out = None
+    in_video_part = False
+    streamable = None
+    thread = None
+    
+    try:
+        while True:
+            chunk = request.stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+            processing_status['bytes_received'] += len(chunk)
+            if request.content_length:
+                processing_status['upload_progress'] = int(processing_status['bytes_received'] / request.content_length * 100)
+            
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, File) and event.name == 'video' and out is None:
+                    if event.filename == '':
+                        return jsonify({'error': 'No selected file'}), 400
+                    if not allowed_file(event.filename):
+                        return jsonify({'error': 'Invalid file type'}), 400
+                    # Create unique filename
+                    filename = secure_filename(f"{timestamp}_{event.filename}")
+                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                    out = open(filepath, 'wb')
+                    in_video_part = True
+                elif isinstance(event, (File, Field)):
+                    in_video_part = False
+                elif isinstance(event, Data) and in_video_part:
+                    out.write(event.data)
+                    out.flush()
+                    upload.add(len(event.data))
+                    
+                    if thread is None and streamable is None and upload.bytes_written >= app.config['STREAM_START_BYTES']:
+                        streamable = is_streamable(filepath)
+                        if streamable:
+                            # Start processing while the upload continues
+                            processing_status['current_video'] = filename
+                            processing_status['violations_found'] = 0
+                            thread = threading.Thread(target=process_video_background, args=(filepath, video_id, upload))
+                            thread.daemon = True
+                            thread.start()
+                    if not event.more_data:
+                        in_video_part = False
+                event = decoder.next_event()
+            
+            if not chunk or isinstance(event, Epilogue):
+                break
+    except Exception as e:
+        upload.finish(error=e)
+        raise
+    finally:
+        if out is not None:
+            out.close()
+        processing_status['is_uploading'] = False
+    
+    upload.finish()
+    if filepath is None:
+        return jsonify({'error': 'No video file'}), 400
+    processing_status['upload_progress'] = 100
+    
+    if thread is None:
+        # Non-streamable container (or small file): process the complete file
         processing_status['current_video'] = filename
         processing_status['violations_found'] = 0
-        
         thread = threading.Thread(target=process_video_background, args=(filepath, video_id))
         thread.daemon = True
         thread.start()
-        
-        return jsonify({
-            'success': True,
-            'video_id': video_id,
-            'filename': filename
-        })
     
-    return jsonify({'error': 'Invalid file type'}), 400
+    return jsonify({
+        'success': True,
+        'video_id': video_id,
+        'filename': filename
+    })
 
 @app.route('/status')
 def get_status():
@@ -156,30 +315,60 @@ def get_status():
 @app.route('/results')
 def results():
     """View all violations"""
-    db = Database(db_path="database/violations.db")
-    violations = db.get_all_violations()  # You'll need to add this method
-    return render_template('results.html', violations=violations)
+    return cached_page('results', lambda: render_template(
+        'results.html', violations=db.get_all_violations()))
 
 @app.route('/dashboard')
 def dashboard():
     """Statistics dashboard"""
-    db = Database(db_path="database/violations.db")
-    stats = db.get_statistics()  # You'll need to add this method
-    return render_template('dashboard.html', stats=stats)
+    return cached_page('dashboard', lambda: render_template(
+        'dashboard.html', stats=db.get_statistics()))
+
+@app.route('/analytics')
+def analytics_dashboard():
+    """Traffic throughput and speed distribution (reads rollups only)"""
+    video_id = request.args.get('video_id')
+    return cached_page(f'analytics-{video_id}', lambda: render_template(
+        'analytics.html',
+        throughput=db.get_throughput(video_id=video_id),
+        distribution=db.get_speed_distribution(video_id=video_id),
+        video_id=video_id))
+
+@app.route('/images/<path:filename>')
+def evidence_image(filename):
+    """Serve an evidence image; ?size=small|medium|large returns a cached thumbnail"""
+    source_path = safe_join(app.config['IMAGE_FOLDER'], filename)
+    if source_path is None or not os.path.isfile(source_path):
+        abort(404)
+    
+    size = request.args.get('size', 'full')
+    if size == 'full':
+        path = source_path
+        etag = thumbnails.source_hash(source_path)
+    elif size in THUMBNAIL_SIZES:
+        path, digest = thumbnails.get(source_path, size)
+        etag = f"{digest}_{size}"
+    else:
+        abort(400)
+    
+    # send_file resolves relative paths against the app root, not the working directory
+    response = send_file(os.path.abspath(path), mimetype='image/jpeg', etag=etag, conditional=True,
+                         max_age=app.config['IMAGE_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/download_report')
 def download_report():
     """Download violations as CSV"""
-    db = Database(db_path="database/violations.db")
     csv_path = db.export_to_csv()  # You'll need to add this method
     return send_file(csv_path, as_attachment=True)
 
 @app.route('/violation/<int:violation_id>')
 def view_violation(violation_id):
     """View single violation details"""
-    db = Database(db_path="database/violations.db")
-    violation = db.get_violation_by_id(violation_id)
-    return render_template('violation_detail.html', violation=violation)
+    return cached_page(f'violation-{violation_id}', lambda: render_template(
+        'violation_detail.html', violation=db.get_violation_by_id(violation_id)))
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+from datetime import datetime
+
+# Speed histogram bin edges in km/h; the last bin is open-ended
+SPEED_BINS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 100, 120]
+
+class TrafficAnalytics:
+    """
+    Aggregates every tracked vehicle into time buckets per vehicle class.
+    Runs after SpeedEstimator; finished buckets are flushed to the
+    rollup table in bulk, so raw per-frame data is never stored.
+    """
+
+    def __init__(self, db, video_id=None, bucket_seconds=60, flush_every=5, speed_bins=SPEED_BINS):
+        self.db = db
+        self.video_id = video_id
+        self.bucket_seconds = bucket_seconds
+        self.flush_every = flush_every  # Number of finished buckets to batch per DB write
+        self.bin_edges = np.array(list(speed_bins) + [np.inf], dtype=float)
+        self.bucket_start = None
+        self.bucket = {}  # vehicle class -> {track id: latest speed, None until measured}
+        self.prev_ids = set()  # Tracks seen in the previous update
+        self.pending = []  # Finished rollup rows waiting to be written
+
+    def update(self, tracked_objects, speeds, timestamp):
+        """Add one frame of tracked vehicles; timestamp is in seconds since the epoch"""
+        start = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+        if self.bucket_start is None:
+            self.bucket_start = start
+        elif start != self.bucket_start:
+            self._close_bucket()
+            self.bucket_start = start
+
+        for obj in tracked_objects:
+            vehicles = self.bucket.setdefault(obj["class"], {})
+            # A track's first sighting has no previous position, so its speed (0)
+            # is not a measurement: count the vehicle but keep it out of speed stats
+            if obj["id"] in self.prev_ids:
+                vehicles[obj["id"]] = speeds.get(obj["id"], 0)
+            else:
+                vehicles.setdefault(obj["id"], None)
+        self.prev_ids = {obj["id"] for obj in tracked_objects}
+
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def _close_bucket(self):
+        """Turn the in-memory bucket into rollup rows (one per vehicle class)"""
+        bucket_time = datetime.fromtimestamp(self.bucket_start).strftime("%Y-%m-%d %H:%M:%S")
+        for vehicle_type, vehicles in self.bucket.items():
+            speeds = np.array([v for v in vehicles.values() if v is not None], dtype=float)
+            hist, _ = np.histogram(speeds, bins=self.bin_edges)
+            self.pending.append({
+                "bucket_start": bucket_time,
+                "bucket_seconds": self.bucket_seconds,
+                "video_id": self.video_id,
+                "vehicle_type": vehicle_type,
+                "vehicle_count": len(vehicles),
+                "speed_samples": len(speeds),
+                "avg_speed": round(float(speeds.mean()), 2) if len(speeds) else None,
+                "p85_speed": round(float(np.percentile(speeds, 85)), 2) if len(speeds) else None,
+                "speed_hist": json.dumps(hist.tolist())
+            })
+        self.bucket = {}
+
+    def flush(self):
+        """Write all finished buckets to the database in one batch"""
+        if self.pending:
+            self.db.insert_rollups(self.pending)
+            self.pending = []
+
+    def close(self):
+        """Finish the current bucket and write everything (call at end of stream)"""
+        if self.bucket:
+            self._close_bucket()
+        self.flush()
@@ -1,5 +1,7 @@
 import sqlite3
 import csv
+import json
+import uuid
 from datetime import datetime
 
 class Database:
@@ -23,9 +25,65 @@ class Database:
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        
+        # Per-bucket, per-class traffic rollups (see src/analytics.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS traffic_rollups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bucket_start DATETIME,
+                bucket_seconds INTEGER,
+                video_id TEXT,
+                vehicle_type TEXT,
+                vehicle_count INTEGER,
+                speed_samples INTEGER,
+                avg_speed REAL,
+                p85_speed REAL,
+                speed_hist TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rollups_bucket ON traffic_rollups (bucket_start)')
+        
+        # Change counter, bumped by triggers on every insert/delete so readers
+        # can tell cheaply whether anything changed. The epoch changes whenever
+        # the database file is recreated.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS db_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                epoch TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO db_meta (id, epoch, version) VALUES (1, ?, 0)', (uuid.uuid4().hex[:8],))
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS violations_insert_version AFTER INSERT ON violations
+            BEGIN
+                UPDATE db_meta SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS violations_delete_version AFTER DELETE ON violations
+            BEGIN
+                UPDATE db_meta SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS rollups_insert_version AFTER INSERT ON traffic_rollups
+            BEGIN
+                UPDATE db_meta SET version = version + 1 WHERE id = 1;
+            END
+        ''')
         conn.commit()
         conn.close()
     
+    def get_version(self):
+        """Current change counter as an opaque string (changes on every insert/delete)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT epoch, version FROM db_meta WHERE id = 1')
+        epoch, version = cursor.fetchone()
+        conn.close()
+        return f"{epoch}-{version}"
+    
     def insert_violation(self, vehicle_id, vehicle_type, speed, violation_type, image_path, video_id=None):
         """Insert a new violation record"""
         conn = sqlite3.connect(self.db_path)
@@ -58,7 +116,8 @@ class Database:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM violations WHERE id = ?', (violation_id,))
-        violation = dict(cursor.fetchone()) if cursor.fetchone() else None
+        row = cursor.fetchone()
+        violation = dict(row) if row else None
         conn.close()
         return violation
     
@@ -108,6 +167,88 @@ class Database:
         conn.close()
         return stats
     
+    def insert_rollups(self, rollups):
+        """Bulk insert traffic rollup rows (list of dicts from TrafficAnalytics)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO traffic_rollups (bucket_start, bucket_seconds, video_id, vehicle_type,
+                                         vehicle_count, speed_samples, avg_speed, p85_speed, speed_hist)
+            VALUES (:bucket_start, :bucket_seconds, :video_id, :vehicle_type,
+                    :vehicle_count, :speed_samples, :avg_speed, :p85_speed, :speed_hist)
+        ''', rollups)
+        conn.commit()
+        conn.close()
+    
+    def get_rollups(self, video_id=None, start=None, end=None):
+        """Get rollup rows, optionally filtered by video and bucket time range"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        query = 'SELECT * FROM traffic_rollups WHERE 1 = 1'
+        params = []
+        if video_id:
+            query += ' AND video_id = ?'
+            params.append(video_id)
+        if start:
+            query += ' AND bucket_start >= ?'
+            params.append(start)
+        if end:
+            query += ' AND bucket_start < ?'
+            params.append(end)
+        cursor.execute(query + ' ORDER BY bucket_start, vehicle_type', params)
+        
+        rollups = [dict(row) for row in cursor.fetchall()]
+        for rollup in rollups:
+            rollup['speed_hist'] = json.loads(rollup['speed_hist'])
+        conn.close()
+        return rollups
+    
+    def get_throughput(self, video_id=None):
+        """Vehicles per bucket (all classes combined), oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if video_id:
+            cursor.execute('''
+                SELECT bucket_start, SUM(vehicle_count) FROM traffic_rollups
+                WHERE video_id = ? GROUP BY bucket_start ORDER BY bucket_start
+            ''', (video_id,))
+        else:
+            cursor.execute('''
+                SELECT bucket_start, SUM(vehicle_count) FROM traffic_rollups
+                GROUP BY bucket_start ORDER BY bucket_start
+            ''')
+        throughput = [{'bucket_start': row[0], 'vehicle_count': row[1]} for row in cursor.fetchall()]
+        conn.close()
+        return throughput
+    
+    def get_speed_distribution(self, video_id=None):
+        """
+        Per vehicle class: total count, weighted average speed, highest bucket p85 and summed histogram.
+        Speed figures only use vehicles whose speed was measured (speed_samples).
+        """
+        distribution = {}
+        for rollup in self.get_rollups(video_id=video_id):
+            entry = distribution.setdefault(rollup['vehicle_type'], {
+                'vehicle_count': 0,
+                'speed_samples': 0,
+                'speed_sum': 0.0,
+                'max_p85_speed': 0.0,
+                'speed_hist': [0] * len(rollup['speed_hist'])
+            })
+            entry['vehicle_count'] += rollup['vehicle_count']
+            if rollup['speed_samples']:
+                entry['speed_samples'] += rollup['speed_samples']
+                entry['speed_sum'] += rollup['avg_speed'] * rollup['speed_samples']
+                entry['max_p85_speed'] = max(entry['max_p85_speed'], rollup['p85_speed'])
+            entry['speed_hist'] = [a + b for a, b in zip(entry['speed_hist'], rollup['speed_hist'])]
+        
+        for entry in distribution.values():
+            speed_sum = entry.pop('speed_sum')
+            entry['avg_speed'] = round(speed_sum / entry['speed_samples'], 2) if entry['speed_samples'] else 0
+        return distribution
+    
     def export_to_csv(self, output_path="violations_report.csv"):
         """Export all violations to CSV"""
         violations = self.get_all_violations()
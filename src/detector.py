@@ -1,17 +1,25 @@
-from ultralytics import YOLO
 import cv2
 
 class VehicleDetector:
     def __init__(self, model_path="D:\Traffic Light System\Models\yolov8n.pt", conf=0.25, imgsz=640):
-        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self._model = None
         self.conf = conf
         self.imgsz = imgsz
 
-    def detect_vehicles(self, frame):
-       
+    @property
+    def model(self):
+        """YOLO model, loaded on first use (importing ultralytics takes seconds)"""
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path)
+        return self._model
+
+    def detect_vehicles(self, frame, imgsz=None):
+        # imgsz overrides the default for this call (used by the latency controller)
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-        results = self.model.predict(rgb_frame, imgsz=self.imgsz, conf=self.conf, verbose=False)
+        results = self.model.predict(rgb_frame, imgsz=imgsz or self.imgsz, conf=self.conf, verbose=False)
 
         detections = []
         for result in results:
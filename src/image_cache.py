@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Longest side in pixels for each size variant
+THUMBNAIL_SIZES = {"small": 160, "medium": 480, "large": 1024}
+
+class ThumbnailCache:
+    """
+    Lazily generated, content-addressed image derivatives on disk.
+    Derivatives are named after the SHA-256 of the source file, so identical
+    evidence images share one set of thumbnails. Total size is capped and
+    the least recently used derivatives are deleted first.
+    """
+
+    def __init__(self, cache_dir="outputs/thumbnails", max_bytes=200 * 1024 * 1024, quality=85):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.lock = threading.Lock()
+        self.hashes = {}  # (source path, mtime, size) -> content hash
+        self.index = OrderedDict()  # derivative path -> bytes, least recently used first
+        self.total_bytes = 0
+        self.index_loaded = False  # Scanned on first use so app startup stays instant
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _load_index(self):
+        """Rebuild the LRU index from files already on disk (oldest mtime first); call with the lock held"""
+        if self.index_loaded:
+            return
+        self.index_loaded = True
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self.index[path] = size
+            self.total_bytes += size
+
+    def source_hash(self, source_path):
+        """SHA-256 of the source file, memoized until the file changes"""
+        stat = os.stat(source_path)
+        key = (source_path, stat.st_mtime_ns, stat.st_size)
+        digest = self.hashes.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(source_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            if len(self.hashes) >= 10000:
+                self.hashes.clear()
+            self.hashes[key] = digest
+        return digest
+
+    def get(self, source_path, size):
+        """Path of the derivative for source_path at the given size variant, generating it if needed"""
+        digest = self.source_hash(source_path)
+        path = os.path.join(self.cache_dir, digest[:2], f"{digest}_{size}.jpg")
+
+        with self.lock:
+            self._load_index()
+            if path in self.index:
+                self.index.move_to_end(path)
+                os.utime(path)  # Keep on-disk order in sync for the next restart
+                return path, digest
+
+        self._render(source_path, path, THUMBNAIL_SIZES[size])
+
+        with self.lock:
+            file_size = os.path.getsize(path)
+            self.total_bytes += file_size - self.index.pop(path, 0)
+            self.index[path] = file_size
+            self._evict(keep=path)
+        return path, digest
+
+    def _render(self, source_path, path, max_side):
+        """Downscale the source image and write it atomically"""
+        import cv2  # Deferred so the web app starts without loading OpenCV
+        image = cv2.imread(source_path)
+        if image is None:
+            raise ValueError(f"Could not read image: {source_path}")
+
+        h, w = image.shape[:2]
+        scale = max_side / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError(f"Could not encode thumbnail for: {source_path}")
+        with open(tmp_path, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path)
+
+    def _evict(self, keep=None):
+        """
+        Delete least recently used derivatives until under the size cap.
+        Files that can't be removed yet (e.g. still being streamed on Windows)
+        stay in the index and are retried on the next eviction.
+        """
+        for path in list(self.index):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Already gone, just drop it from the index
+            except OSError:
+                continue
+            self.total_bytes -= self.index.pop(path)
+
+    def stats(self):
+        with self.lock:
+            self._load_index()
+        return {
+            "files": len(self.index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
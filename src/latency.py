@@ -0,0 +1,96 @@
+import time
+
+class LatencyController:
+    """
+    Keeps real-time processing within a per-frame latency budget (1 / target_fps).
+    Under load it steps down a quality ladder (smaller detector imgsz, then
+    running detection only every Nth frame); when headroom returns it steps back up.
+    If lag still accumulates, decoded frames are dropped so the backlog stays bounded.
+    Sources that report no frame rate (many live cameras/RTSP report 0) use default_fps.
+    """
+
+    def __init__(self, target_fps, imgsz_levels=(640, 480, 320), max_stride=4,
+                 headroom=0.7, smoothing=0.1, patience=15, max_lag_frames=2, default_fps=25):
+        if not target_fps or target_fps <= 0:
+            target_fps = default_fps
+        self.budget = 1.0 / target_fps
+        # Quality ladder from best to cheapest: (imgsz, detection stride)
+        self.levels = [(imgsz, 1) for imgsz in imgsz_levels]
+        self.levels += [(imgsz_levels[-1], stride) for stride in range(2, max_stride + 1)]
+        self.level = 0
+        self.headroom = headroom  # Step up when latency is below this fraction of the budget
+        self.smoothing = smoothing  # EMA weight of the newest sample
+        self.patience = patience  # Frames between level changes
+        self.max_lag = max_lag_frames * self.budget
+        self.avg_latency = None
+        self.lag = 0.0  # Seconds we are behind the target frame rate
+        self.frames_since_change = 0
+        self.frames_dropped = 0
+        self.dropping = False
+        self.frame_start = None
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][0]
+
+    @property
+    def stride(self):
+        return self.levels[self.level][1]
+
+    def should_drop(self):
+        """Call once per decoded frame; True means skip it entirely to catch up"""
+        # Once dropping, keep going until fully caught up
+        if self.lag > self.max_lag or (self.dropping and self.lag > 0):
+            if not self.dropping:
+                print(f"⏱️  Behind by {self.lag * 1000:.1f}ms: dropping frames")
+                self.dropping = True
+            self.lag = max(0.0, self.lag - self.budget)
+            self.frames_dropped += 1
+            return True
+        if self.dropping:
+            print(f"⏱️  Caught up: resumed processing (dropped frames so far: {self.frames_dropped})")
+            self.dropping = False
+        return False
+
+    def should_detect(self, frame_index):
+        """True if the detector should run on this frame at the current stride"""
+        return frame_index % self.stride == 0
+
+    def start_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Record the latency of the frame started with start_frame() and adapt quality"""
+        latency = time.perf_counter() - self.frame_start
+        self.lag = max(0.0, self.lag + latency - self.budget)
+
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += self.smoothing * (latency - self.avg_latency)
+
+        self.frames_since_change += 1
+        if self.frames_since_change < self.patience:
+            return
+
+        if self.avg_latency > self.budget and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1, "over budget")
+        elif self.avg_latency < self.budget * self.headroom and self.level > 0:
+            self._set_level(self.level - 1, "headroom")
+
+    def _set_level(self, level, reason):
+        old_imgsz, old_stride = self.levels[self.level]
+        self.level = level
+        self.frames_since_change = 0
+        print(f"⏱️  Latency {self.avg_latency * 1000:.1f}ms vs budget {self.budget * 1000:.1f}ms ({reason}): "
+              f"imgsz {old_imgsz}->{self.imgsz}, stride {old_stride}->{self.stride}, "
+              f"dropped frames so far: {self.frames_dropped}")
+
+    def stats(self):
+        return {
+            "imgsz": self.imgsz,
+            "stride": self.stride,
+            "avg_latency_ms": round((self.avg_latency or 0) * 1000, 1),
+            "budget_ms": round(self.budget * 1000, 1),
+            "frames_dropped": self.frames_dropped
+        }
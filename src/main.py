@@ -6,40 +6,64 @@ from src.traffic_light import TrafficLight
 from src.violation import ViolationChecker
 from src.database import Database
 from src.speed_estimator import SpeedEstimator
+from src.zones import CameraGeometry
+from src.analytics import TrafficAnalytics
+from src.latency import LatencyController
+from src.video_reader import FrameReader
 import os
 import shutil
+import time
 from datetime import datetime
 
 CLEAR_OLD_DATA = True  
 BASE_DIR = r"D:\Traffic Light System"
 
-if CLEAR_OLD_DATA:
-    print("🗑️  Clearing old violation data...")
+# Path to input video
+VIDEO_PATH = os.path.join(BASE_DIR, "data", "Cars_Moving_On_Road_Stock_Footage_-_Free_Download_1080P.mp4")
+
+# Per-camera violation geometry (stop line, intersection, lane speed zones)
+GEOMETRY_PATH = os.path.join(BASE_DIR, "config", "camera_geometry.json")
+
+# Track which vehicles have already been recorded for violations.
+# A vehicle is recorded again only after not violating for this many seconds.
+DEDUP_WINDOW = 300
+
+# Used when the source does not report a frame rate (common for live cameras)
+DEFAULT_FPS = 25
+
+DISPLAY_WIDTH = 1200
+DISPLAY_HEIGHT=800
+
+
+def clear_old_data():
+    """Delete (or keep) data from previous runs and make sure output folders exist"""
+    if CLEAR_OLD_DATA:
+        print("🗑️  Clearing old violation data...")
     
-    # Remove old images - use the exact paths
-    images_path = r"D:\Traffic Light System\outputs\images"
-    if os.path.exists(images_path):
-        shutil.rmtree(images_path)
-        print(f"   ✓ Deleted old images from: {images_path}")
-    else:
-        print(f"   ℹ No images folder found at: {images_path}")
+        # Remove old images - use the exact paths
+        images_path = r"D:\Traffic Light System\outputs\images"
+        if os.path.exists(images_path):
+            shutil.rmtree(images_path)
+            print(f"   ✓ Deleted old images from: {images_path}")
+        else:
+            print(f"   ℹ No images folder found at: {images_path}")
     
-    # Remove old database - use the exact path
-    db_path = r"D:\Traffic Light System\database\violations.db"
-    if os.path.exists(db_path):
-        os.remove(db_path)
-        print(f"   ✓ Deleted old database from: {db_path}")
-    else:
-        print(f"   ℹ No database found at: {db_path}")
+        # Remove old database - use the exact path
+        db_path = r"D:\Traffic Light System\database\violations.db"
+        if os.path.exists(db_path):
+            os.remove(db_path)
+            print(f"   ✓ Deleted old database from: {db_path}")
+        else:
+            print(f"   ℹ No database found at: {db_path}")
     
-    print("✅ Cleanup complete\n")
-else:
-    print("📁 Keeping existing violation data")
-    print("   (Set CLEAR_OLD_DATA=True to delete old records)\n")
+        print("✅ Cleanup complete\n")
+    else:
+        print("📁 Keeping existing violation data")
+        print("   (Set CLEAR_OLD_DATA=True to delete old records)\n")
 
-# Always ensure directories exist
-os.makedirs(r"D:\Traffic Light System\outputs\images", exist_ok=True)
-os.makedirs(r"D:\Traffic Light System\database", exist_ok=True)
+    # Always ensure directories exist
+    os.makedirs(r"D:\Traffic Light System\outputs\images", exist_ok=True)
+    os.makedirs(r"D:\Traffic Light System\database", exist_ok=True)
 
 # Optional: Archive old data instead of deleting
 def archive_old_data():
@@ -60,109 +84,144 @@ def archive_old_data():
         print(f"📦 Archived database to {archive_dir}/violations.db")
 
 
-# Path to input video
-VIDEO_PATH = os.path.join(BASE_DIR, "data", "Cars_Moving_On_Road_Stock_Footage_-_Free_Download_1080P.mp4")
-
-# Initialize modules
-detector = VehicleDetector(os.path.join(BASE_DIR, "models", "yolov8n.pt"))
-tracker = VehicleTracker()
-light = TrafficLight()
-speed_estimator = None
-violation_checker = ViolationChecker(save_dir=os.path.join(BASE_DIR, "outputs", "images"))
-db = Database(db_path=os.path.join(BASE_DIR, "database", "violations.db"))
-
-# Open video
-cap = cv2.VideoCapture(VIDEO_PATH)
-fps = cap.get(cv2.CAP_PROP_FPS)
-speed_estimator = SpeedEstimator(
-    fps=fps,
-    pixel_to_meter=0.024423  # ← YOUR CALIBRATED VALUE HERE (example)
-)
-# Track which vehicles have already been recorded for violations
-recorded_violations = set()
-
-DISPLAY_WIDTH = 1200
-DISPLAY_HEIGHT=800
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
 
-    frame = cv2.resize(frame, (DISPLAY_WIDTH, DISPLAY_HEIGHT))
-
-
-    # 1. Detect vehicles
-    detections = detector.detect_vehicles(frame)
-
-    # 2. Track vehicles
-    tracked_objects = tracker.update(detections)
-
-    # 3. Estimate speed
-    speeds = speed_estimator.estimate(tracked_objects)
-
-    # 4. Check for violations (only returns actual violations)
-    violations = violation_checker.check(frame, tracked_objects, speeds, light.get_state())
-
-    # 5. Save violations ONCE per vehicle in DB
-    for violation in violations:
-        obj_id = violation["vehicle_id"]
+def main():
+    # Initialize modules
+    detector = VehicleDetector(os.path.join(BASE_DIR, "models", "yolov8n.pt"))
+    tracker = VehicleTracker()
+    light = TrafficLight()
+    speed_estimator = None
+    geometry = None
+    if os.path.exists(GEOMETRY_PATH):
+        geometry = CameraGeometry.from_json(GEOMETRY_PATH, frame_size=(DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    violation_checker = ViolationChecker(save_dir=os.path.join(BASE_DIR, "outputs", "images"), geometry=geometry,
+                                         capture_window=DEDUP_WINDOW)
+    db = Database(db_path=os.path.join(BASE_DIR, "database", "violations.db"))
+    analytics = TrafficAnalytics(db, bucket_seconds=60)
+
+    # Open video, decoding straight to the display size
+    cap = FrameReader(cv2.VideoCapture(VIDEO_PATH), size=(DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 0:
+        fps = DEFAULT_FPS
+    speed_estimator = SpeedEstimator(
+        fps=fps,
+        pixel_to_meter=0.024423  # ← YOUR CALIBRATED VALUE HERE (example)
+    )
+    violation_count = 0
+
+    # Analytics buckets use video time: start of processing + frame timestamp
+    start_time = time.time()
+    frame_index = 0
+
+    # Degrade quality instead of falling behind the source frame rate
+    TARGET_FPS = fps
+    latency = LatencyController(target_fps=TARGET_FPS, imgsz_levels=(640, 480, 320), max_stride=4)
+    tracked_objects, speeds, violations = [], {}, []
+
+    while cap.isOpened():
+        # 0. Drop frames while we are too far behind (grab only, never retrieved)
+        if latency.should_drop():
+            if not cap.grab():
+                break
+            frame_index += 1
+            continue
+
+        latency.start_frame()
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        frame_index += 1
+        # Real frame time: file position, or frame count when the source has none.
+        # Both are stream time, so they can't drift apart like wall clock would.
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        frame_time = pos_msec / 1000.0 if pos_msec > 0 else (frame_index - 1) / fps
+
+        # Between detection frames, keep showing the last results
+        if latency.should_detect(frame_index):
+            # 1. Detect vehicles
+            detections = detector.detect_vehicles(frame, imgsz=latency.imgsz)
+
+            # 2. Track vehicles
+            tracked_objects = tracker.update(detections)
+
+            # 3. Estimate speed
+            speeds = speed_estimator.estimate(tracked_objects, timestamp=frame_time)
+            analytics.update(tracked_objects, speeds, start_time + frame_time)
+
+            # 4. Check for violations (only returns actual violations)
+            violations = violation_checker.check(frame, tracked_objects, speeds, light.get_state(), now=frame_time)
+        else:
+            violations = []
+
+        # 5. Save violations ONCE per vehicle in DB
+        for violation in violations:
+            obj_id = violation["vehicle_id"]
         
-        # Only save if this vehicle hasn't been recorded yet
-        if obj_id not in recorded_violations:
-            db.insert_violation(
-                vehicle_id=obj_id,
-                vehicle_type=violation["vehicle_type"],
-                speed=violation["speed"],
-                violation_type=violation["violation"],
-                image_path=violation["image"]
-            )
-            recorded_violations.add(obj_id)
-            print(f"⚠️  VIOLATION RECORDED: ID {obj_id} - {violation['violation']} ({violation['speed']} km/h)")
-
-    # 6. Draw bounding boxes for all tracked vehicles
-    for obj in tracked_objects:
-        x1, y1, x2, y2 = map(int, obj["bbox"])
-        obj_id = obj["id"]
-        speed = speeds.get(obj_id, 0)
+            # Only save if this vehicle hasn't been recorded within the dedup window
+            if violation["new"]:
+                db.insert_violation(
+                    vehicle_id=obj_id,
+                    vehicle_type=violation["vehicle_type"],
+                    speed=violation["speed"],
+                    violation_type=violation["violation"],
+                    image_path=violation["image"]
+                )
+                violation_count += 1
+                print(f"⚠️  VIOLATION RECORDED: ID {obj_id} - {violation['violation']} ({violation['speed']} km/h)")
+
+        # 6. Draw bounding boxes for all tracked vehicles
+        for obj in tracked_objects:
+            x1, y1, x2, y2 = map(int, obj["bbox"])
+            obj_id = obj["id"]
+            speed = speeds.get(obj_id, 0)
         
-        # Check if this vehicle is currently violating
-        is_violating = any(v["vehicle_id"] == obj_id for v in violations)
+            # Check if this vehicle is currently violating
+            is_violating = any(v["vehicle_id"] == obj_id for v in violations)
         
-        # RED box for violations, WHITE box for normal
-        box_color = (0, 0, 255) if is_violating else (255, 255, 255)
-        text_color = (0, 0, 255) if is_violating else (255, 255, 255)
+            # RED box for violations, WHITE box for normal
+            box_color = (0, 0, 255) if is_violating else (255, 255, 255)
+            text_color = (0, 0, 255) if is_violating else (255, 255, 255)
         
-        # Draw box
-        cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
+            # Draw box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
         
-        # Draw speed label
-        label = f"ID:{obj_id} {speed:.1f}km/h"
-        if is_violating:
-            label += " VIOLATION!"
+            # Draw speed label
+            label = f"ID:{obj_id} {speed:.1f}km/h"
+            if is_violating:
+                label += " VIOLATION!"
         
-        cv2.putText(frame, label,
-                    (x1, y1 - 10),
+            cv2.putText(frame, label,
+                        (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6,
+                        text_color,
+                        2)
+
+        # 7. Display violation summary on screen
+        cv2.putText(frame, f"Total Violations: {violation_count}",
+                    (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    text_color,
+                    1.0,
+                    (0, 0, 255),
                     2)
 
-    # 7. Display violation summary on screen
-    violation_count = len(recorded_violations)
-    cv2.putText(frame, f"Total Violations: {violation_count}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.0,
-                (0, 0, 255),
-                2)
+        # 8. Show the live video
+        cv2.imshow("Traffic Violation System", frame)
+
+        latency.end_frame()
 
-    # 8. Show the live video
-    cv2.imshow("Traffic Violation System", frame)
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            break
 
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
+    cap.release()
+    cv2.destroyAllWindows()
+    analytics.close()
+    print(f"\n✅ Processing complete. Total violations recorded: {violation_count}")
+    print(f"   Latency: {latency.stats()}")
+    print(f"   Track state: {violation_checker.violation_captured.stats()}")
 
-cap.release()
-cv2.destroyAllWindows()
-print(f"\n✅ Processing complete. Total violations recorded: {violation_count}")
\ No newline at end of file
+if __name__ == "__main__":
+    clear_old_data()
+    main()
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+import threading
+
+
+class ResponseCache:
+    """
+    Small LRU cache of rendered pages keyed by (page key, data version).
+    Entries for old versions are never hit again and fall off the end.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self.lock:
+            body = self.entries.get((key, version))
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((key, version))
+            self.hits += 1
+            return body
+
+    def put(self, key, version, body):
+        with self.lock:
+            self.entries[(key, version)] = body
+            self.entries.move_to_end((key, version))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -10,7 +10,12 @@ class SpeedEstimator:
         self.window_size = window_size
         self.min_dist_thresh = min_dist_thresh
 
-    def estimate(self, tracked_objects):
+    def estimate(self, tracked_objects, timestamp=None):
+        """
+        timestamp: frame time in seconds. When given, speeds use the real time
+        between observations, so skipped or dropped frames don't distort them.
+        Without it, consecutive calls are assumed to be 1/fps apart.
+        """
         current_speeds = {}
 
         for obj in tracked_objects:
@@ -21,7 +26,7 @@ class SpeedEstimator:
             cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
 
             if obj_id in self.prev_positions:
-                px, py = self.prev_positions[obj_id]
+                px, py, prev_time = self.prev_positions[obj_id]
                 
                 # 1. Euclidean distance
                 dist_px = math.dist((cx, cy), (px, py))
@@ -32,7 +37,10 @@ class SpeedEstimator:
 
                 # 3. Speed in m/s and km/h
                 dist_m = dist_px * self.pixel_to_meter
-                speed_mps = dist_m * self.fps
+                if timestamp is not None and prev_time is not None and timestamp > prev_time:
+                    speed_mps = dist_m / (timestamp - prev_time)
+                else:
+                    speed_mps = dist_m * self.fps
                 speed_kmph = speed_mps * 3.6
                 
                 # 4. Moving average smoothing
@@ -46,7 +54,7 @@ class SpeedEstimator:
                 self.speed_buffer[obj_id] = deque(maxlen=self.window_size)
 
             # Update previous position
-            self.prev_positions[obj_id] = (cx, cy)
+            self.prev_positions[obj_id] = (cx, cy, timestamp)
 
         # Cleanup old objects
         active_ids = {obj["id"] for obj in tracked_objects}
@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+
+# Containers whose frames can be decoded before the file is complete.
+# MP4/MOV only qualify when the 'moov' index comes before the media data.
+# MKV is left out: its demuxer silently skips a block that is still being
+# written and resyncs on the next one, so frames get dropped while it grows.
+STREAMABLE_EXTENSIONS = {'avi'}
+ATOM_EXTENSIONS = {'mp4', 'mov'}
+
+def is_streamable(path):
+    """
+    True/False if the partially written file can be decoded while it grows,
+    None if not enough bytes have arrived yet to tell.
+    """
+    ext = path.rsplit('.', 1)[-1].lower()
+    if ext in STREAMABLE_EXTENSIONS:
+        return True
+    if ext not in ATOM_EXTENSIONS:
+        return False
+
+    # Walk top-level atoms: [size:4][type:4], size 1 means a 64-bit size follows
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, atom = struct.unpack('>I4s', f.read(8))
+            if atom == b'moov':
+                return True
+            if atom == b'mdat':
+                return False
+            if size == 1:
+                if offset + 16 > file_size:
+                    return None
+                size = struct.unpack('>Q', f.read(8))[0]
+            if size < 8:
+                return False  # size 0 (runs to end of file) or corrupt
+            offset += size
+    return None
+
+
+class UploadState:
+    """Shared progress of a file being written by the upload handler"""
+
+    def __init__(self, total_bytes=None):
+        self.total_bytes = total_bytes
+        self.bytes_written = 0
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def add(self, n):
+        with self.cond:
+            self.bytes_written += n
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def wait_for(self, min_bytes, timeout=None):
+        """Block until min_bytes are written or the upload ends; returns bytes written"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.done or self.bytes_written >= min_bytes, timeout)
+            return self.bytes_written
+
+
+class GrowingVideoCapture:
+    """
+    cv2.VideoCapture over a file that is still being uploaded.
+    When the decoder runs out of bytes it waits for more data, reopens the
+    file and seeks back to the next unread frame.
+    A retrieved frame is only returned once the following frame can be
+    grabbed (or the upload is complete), so a frame truncated at the edge
+    of the written bytes is decoded again after the reopen.
+    """
+
+    def __init__(self, path, upload, min_bytes=2 * 1024 * 1024, step_bytes=1024 * 1024):
+        self.path = path
+        self.upload = upload
+        self.min_bytes = min_bytes  # Bytes needed before the first open
+        self.step_bytes = step_bytes  # New bytes to wait for before reopening
+        self.cap = None
+        self.complete_at_open = False
+        self.bytes_at_open = 0
+        self.frame_index = 0
+        self.lookahead = False  # Next frame already grabbed while confirming the last one
+        self.at_end = False
+
+    def _open(self):
+        """Open (or reopen) the capture, waiting for data until the header is readable"""
+        import cv2  # Deferred so importing this module stays cheap
+        wanted = self.min_bytes if self.cap is None else self.bytes_at_open + self.step_bytes
+        while True:
+            self.bytes_at_open = self.upload.wait_for(wanted)
+            self.complete_at_open = self.upload.done
+            if self.cap is not None:
+                self.cap.release()
+            self.cap = cv2.VideoCapture(self.path)
+            if self.cap.isOpened() or self.complete_at_open:
+                break
+            wanted = self.bytes_at_open + self.step_bytes
+
+        if self.frame_index:
+            # Skip the frames already processed
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index)
+
+    def isOpened(self):
+        if self.cap is None:
+            self._open()
+        return self.cap.isOpened() and self.upload.error is None
+
+    def get(self, prop):
+        if self.cap is None:
+            self._open()
+        return self.cap.get(prop)
+
+    def grab(self):
+        if self.cap is None:
+            self._open()
+        if self.lookahead:
+            self.lookahead = False
+            self.frame_index += 1
+            return True
+        if self.at_end:
+            return False
+        while True:
+            if self.cap.grab():
+                self.frame_index += 1
+                return True
+            # End of file: real end only if the upload had finished when we opened it
+            if self.complete_at_open or self.upload.error is not None:
+                return False
+            self._open()
+
+    def retrieve(self, image=None):
+        while True:
+            ret, image = self.cap.retrieve(image)
+            if not ret:
+                return ret, image
+            # The frame is complete if the demuxer can find the next one
+            if self.cap.grab():
+                self.lookahead = True
+                return ret, image
+            if self.complete_at_open or self.upload.error is not None:
+                self.at_end = True
+                return ret, image
+            # Frame was at the edge of the written bytes and may be truncated:
+            # wait for more data, reopen just before it and decode it again
+            self.frame_index -= 1
+            self._open()
+            if not self.grab():
+                return False, None
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+
+
+class TrackRegistry:
+    """
+    Per-track state with last-seen timestamps.
+    Entries not touched for `ttl` seconds expire, and the least recently
+    seen entries are dropped once `max_size` is exceeded, so memory stays
+    flat on long-running streams.
+    """
+
+    def __init__(self, ttl=60.0, max_size=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> state dict, oldest first
+        self.evicted_expired = 0
+        self.evicted_lru = 0
+
+    def touch(self, key, now=None, **state):
+        """Mark a track as seen now, optionally updating its state"""
+        now = self.clock() if now is None else now
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            entry = {"first_seen": now}
+        entry.update(state)
+        entry["last_seen"] = now
+        self.entries[key] = entry
+        self.evict(now)
+        return entry
+
+    def get(self, key, now=None):
+        """Return the state of a live track, or None if unknown or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        now = self.clock() if now is None else now
+        if now - entry["last_seen"] > self.ttl:
+            return None
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def evict(self, now=None):
+        """Drop expired entries, then the least recently seen ones over max_size"""
+        now = self.clock() if now is None else now
+        removed = 0
+
+        # Entries are kept in last-seen order, so expired ones are at the front
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if now - entry["last_seen"] <= self.ttl:
+                break
+            del self.entries[key]
+            self.evicted_expired += 1
+            removed += 1
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evicted_lru += 1
+            removed += 1
+
+        return removed
+
+    def stats(self):
+        """Size and eviction counters for monitoring"""
+        return {
+            "active": len(self.entries),
+            "evicted_expired": self.evicted_expired,
+            "evicted_lru": self.evicted_lru
+        }
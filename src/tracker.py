@@ -2,10 +2,19 @@
 import numpy as np
 
 class VehicleTracker:
-    def __init__(self, iou_threshold=0.3):
+    def __init__(self, iou_threshold=0.3, max_id=1_000_000):
         self.next_id = 0
         self.tracks = {}  
         self.iou_threshold = iou_threshold
+        self.max_id = max_id  # IDs wrap around after this so they stay bounded
+
+    def _new_id(self, taken):
+        """Next free ID, wrapping at max_id and skipping IDs still in use"""
+        while self.next_id in self.tracks or self.next_id in taken:
+            self.next_id = (self.next_id + 1) % self.max_id
+        new_id = self.next_id
+        self.next_id = (self.next_id + 1) % self.max_id
+        return new_id
 
     def _iou(self, boxA, boxB):
         """
@@ -49,9 +58,9 @@ class VehicleTracker:
                 det["id"] = best_id
             else:
            
-                det["id"] = self.next_id
-                updated_tracks[self.next_id] = bbox
-                self.next_id += 1
+                new_id = self._new_id(updated_tracks)
+                det["id"] = new_id
+                updated_tracks[new_id] = bbox
 
         self.tracks = updated_tracks
         return detections
@@ -0,0 +1,58 @@
+import cv2
+
+class FrameReader:
+    """
+    Reads frames at a target resolution and stride.
+    Skipped frames are only grab()bed (never converted to BGR or copied out).
+    Kept frames are retrieve()d and downscaled into buffers that are reused
+    when OpenCV can, which avoids most per-frame allocations after the first
+    frame. Live cameras are also asked to deliver the target size directly.
+    """
+
+    def __init__(self, cap, size=None, stride=1, interpolation=cv2.INTER_AREA):
+        self.cap = cap
+        self.size = size  # (width, height) or None to keep the source size
+        self.stride = stride  # Return every Nth frame
+        self.interpolation = interpolation
+        self.frame_index = 0  # Frames consumed from the source, including skipped ones
+        self.raw = None
+        self.resized = None
+
+        if size is not None and hasattr(cap, "set"):
+            # Only honoured by capture devices; files ignore it and are resized below
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def grab(self):
+        """Advance one frame without retrieving it"""
+        if not self.cap.grab():
+            return False
+        self.frame_index += 1
+        return True
+
+    def read(self):
+        """Skip stride - 1 frames, then return the next one at the target size"""
+        for _ in range(self.stride - 1):
+            if not self.grab():
+                return False, None
+        if not self.grab():
+            return False, None
+
+        ret, self.raw = self.cap.retrieve(self.raw)
+        if not ret:
+            return False, None
+
+        frame = self.raw
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            self.resized = cv2.resize(frame, tuple(self.size), dst=self.resized, interpolation=self.interpolation)
+            frame = self.resized
+        return True, frame
+
+    def release(self):
+        self.cap.release()
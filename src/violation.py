@@ -1,58 +1,110 @@
 import time
 import os
+import hashlib
 import cv2
+import numpy as np
+
+from src.zones import CameraGeometry
+from src.track_state import TrackRegistry
 
 SPEED_LIMIT = 60  # km/h
 
 class ViolationChecker:
-    def __init__(self, save_dir="data/images"):
+    def __init__(self, save_dir="data/images", geometry=None, capture_window=300.0, max_tracks=10000):
         self.save_dir = save_dir
         os.makedirs(save_dir, exist_ok=True)
-        self.violation_captured = {}  # Track which vehicles already have saved images
+        # Single record of which vehicles were already captured (image saved and
+        # reported as new); an entry lives for capture_window seconds after the
+        # vehicle was last seen violating
+        self.violation_captured = TrackRegistry(ttl=capture_window, max_size=max_tracks)
+        self.geometry = geometry or CameraGeometry()
+        self.prev_centers = {}  # Track centre from the previous frame
 
-    def check(self, frame, tracked_objects, speeds, light_state):
+    def check(self, frame, tracked_objects, speeds, light_state, now=None):
         """
         Returns list of violations ONLY when they occur.
-        Only saves image once per vehicle.
+        Only saves image once per vehicle; "new" is True for that first capture,
+        which is the one callers should record.
+        now: frame time in seconds for the dedup window (defaults to the wall clock).
+        Red light violations need a configured stop line: a vehicle is only
+        flagged on the frame its centre crosses the line while the light is RED.
         """
         violations = []
+        if not tracked_objects:
+            self.prev_centers = {}
+            return violations
+
+        ids = [obj["id"] for obj in tracked_objects]
+        boxes = np.array([obj["bbox"] for obj in tracked_objects], dtype=float).reshape(-1, 4)
+        centers = np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2))
+        # New tracks have no previous centre, so they cannot have crossed anything yet
+        prev = np.array([self.prev_centers.get(obj_id, c) for obj_id, c in zip(ids, centers)], dtype=float).reshape(-1, 2)
+        speed_arr = np.array([speeds.get(obj_id, 0) for obj_id in ids], dtype=float)
+
+        # Evaluate geometry for all tracks at once
+        limits, zone_names = self.geometry.speed_limits(centers, SPEED_LIMIT)
+        overspeed = speed_arr > limits
+        if light_state == "RED":
+            red_light = self.geometry.crossed_stop_line(prev, centers)
+        else:
+            red_light = np.zeros(len(ids), dtype=bool)
 
-        for obj in tracked_objects:
+        self.prev_centers = {obj_id: tuple(c) for obj_id, c in zip(ids, centers)}
+        evidence_path = None  # Frame is encoded and stored at most once per call
+
+        for i in np.flatnonzero(overspeed | red_light):
+            obj = tracked_objects[i]
             obj_id = obj["id"]
             vehicle_type = obj["class"]
-            speed = speeds.get(obj_id, 0)
+            speed = float(speed_arr[i])
 
-            violation_type = None
-            
             # Check for overspeed violation
-            if speed > SPEED_LIMIT:
+            if overspeed[i]:
                 violation_type = "Overspeed"
-            
+
             # Check for red light violation
-            elif light_state == "RED":
+            else:
                 violation_type = "Red Light"
 
-            # Only process if there's an actual violation
-            if violation_type:
-                # Only save image once per vehicle
-                if obj_id not in self.violation_captured:
-                    img_path = os.path.join(
-                        self.save_dir, 
-                        f"{vehicle_type}_{obj_id}_{int(time.time())}.jpg"
-                    )
-                    cv2.imwrite(img_path, frame)
-                    self.violation_captured[obj_id] = True
-                else:
-                    # Use existing image path (won't be saved again to DB)
-                    img_path = f"Already captured for ID {obj_id}"
-
-                violations.append({
-                    "vehicle_id": obj_id,
-                    "vehicle_type": vehicle_type,
-                    "speed": round(speed, 2),
-                    "violation": violation_type,
-                    "image": img_path,
-                    "time": time.strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-        return violations
\ No newline at end of file
+            # Only save image once per vehicle within the capture window
+            captured = self.violation_captured.get(obj_id, now=now)
+            is_new = captured is None
+            if is_new:
+                if evidence_path is None:
+                    evidence_path = self._save_evidence(frame)
+                img_path = evidence_path
+            else:
+                # Reuse the image saved on first capture
+                img_path = captured["image"]
+            self.violation_captured.touch(obj_id, now=now, image=img_path)
+
+            violations.append({
+                "vehicle_id": obj_id,
+                "vehicle_type": vehicle_type,
+                "speed": round(speed, 2),
+                "speed_limit": float(limits[i]),
+                "zone": zone_names[i],
+                "violation": violation_type,
+                "image": img_path,
+                "new": is_new,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+
+        return violations
+
+    def _save_evidence(self, frame):
+        """
+        Store the frame as JPEG under its content hash, so identical evidence
+        (several violators in one frame) is written once and shared by every row.
+        """
+        ok, encoded = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise ValueError("Could not encode evidence frame")
+        data = encoded.tobytes()
+        img_path = os.path.join(self.save_dir, f"{hashlib.sha256(data).hexdigest()}.jpg")
+        if not os.path.exists(img_path):
+            tmp_path = f"{img_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, img_path)
+        return img_path
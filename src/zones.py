@@ -0,0 +1,144 @@
+import json
+import numpy as np
+
+
+def segments_intersect(p_start, p_end, a, b):
+    """
+    Vectorized segment intersection test.
+    p_start, p_end: (N, 2) arrays of movement segments (previous -> current centre)
+    a, b: end points of a single line segment (e.g. the stop line)
+    Returns a boolean array of shape (N,)
+    """
+    p_start = np.asarray(p_start, dtype=float).reshape(-1, 2)
+    p_end = np.asarray(p_end, dtype=float).reshape(-1, 2)
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+
+    def cross(o, u, v):
+        return (u[..., 0] - o[..., 0]) * (v[..., 1] - o[..., 1]) - (u[..., 1] - o[..., 1]) * (v[..., 0] - o[..., 0])
+
+    # Side of the line for the previous and current centre
+    d1 = cross(a, b, p_start)
+    d2 = cross(a, b, p_end)
+    # Side of the movement segment for each end of the line
+    d3 = cross(p_start, p_end, a)
+    d4 = cross(p_start, p_end, b)
+
+    # Current centre must be strictly past the line: a car that stops on the
+    # line is counted once, on the move that takes it off the line
+    return (d2 != 0) & (d1 * d2 <= 0) & (d3 * d4 <= 0)
+
+
+def points_in_polygon(points, polygon):
+    """
+    Vectorized ray casting point-in-polygon test.
+    points: (N, 2) array, polygon: (M, 2) array of vertices
+    Returns a boolean array of shape (N,)
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    if len(points) == 0 or len(polygon) < 3:
+        return np.zeros(len(points), dtype=bool)
+
+    px = points[:, 0:1]
+    py = points[:, 1:2]
+    xi, yi = polygon[:, 0], polygon[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+
+    # Edges that straddle the horizontal ray through each point
+    straddles = (yi > py) != (yj > py)
+    dy = np.where(yj == yi, 1.0, yj - yi)
+    x_cross = (xj - xi) * (py - yi) / dy + xi
+    hits = straddles & (px < x_cross)
+
+    return np.count_nonzero(hits, axis=1) % 2 == 1
+
+
+class SpeedZone:
+    def __init__(self, name, polygon, speed_limit):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=float)
+        self.speed_limit = speed_limit
+
+
+class CameraGeometry:
+    """
+    Per-camera violation geometry in pixel coordinates of the processed frame:
+    - stop_line: ((x1, y1), (x2, y2))
+    - intersection: polygon a vehicle enters after crossing the stop line
+    - speed_zones: per-lane polygons, each with its own speed limit
+    Config files store the "frame_size" [width, height] their coordinates were
+    drawn on, and are scaled to the actual frame size at load time.
+    """
+
+    def __init__(self, stop_line=None, intersection=None, speed_zones=None):
+        self.stop_line = np.asarray(stop_line, dtype=float) if stop_line is not None else None
+        self.intersection = np.asarray(intersection, dtype=float) if intersection is not None else None
+        self.speed_zones = speed_zones or []
+
+    @classmethod
+    def from_dict(cls, config, frame_size=None):
+        """
+        Build geometry from a plain dict (e.g. loaded from JSON).
+        frame_size: (width, height) of the frames it will be applied to;
+        required when the config has a reference "frame_size".
+        """
+        reference_size = config.get("frame_size")
+        if reference_size is not None and frame_size is None:
+            raise ValueError("Geometry has a reference frame_size; pass the actual frame_size to scale it")
+        if reference_size is not None:
+            scale = np.array([frame_size[0] / reference_size[0], frame_size[1] / reference_size[1]])
+        else:
+            scale = np.ones(2)
+
+        def scaled(points):
+            return np.asarray(points, dtype=float) * scale if points is not None else None
+
+        zones = [
+            SpeedZone(z.get("name", f"zone_{i}"), scaled(z["polygon"]), z["speed_limit"])
+            for i, z in enumerate(config.get("speed_zones", []))
+        ]
+        return cls(
+            stop_line=scaled(config.get("stop_line")),
+            intersection=scaled(config.get("intersection")),
+            speed_zones=zones
+        )
+
+    @classmethod
+    def from_json(cls, path, frame_size=None):
+        """Load geometry for one camera from a JSON file, scaled to frame_size"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), frame_size=frame_size)
+
+    def crossed_stop_line(self, prev_centers, centers):
+        """True for every track whose movement this frame crossed the stop line into the intersection"""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        if self.stop_line is None:
+            return np.zeros(len(centers), dtype=bool)
+
+        crossed = segments_intersect(prev_centers, centers, self.stop_line[0], self.stop_line[1])
+
+        # With an intersection polygon, only count crossings that end up inside it
+        # (ignores vehicles moving away from the junction)
+        if self.intersection is not None:
+            crossed &= points_in_polygon(centers, self.intersection)
+
+        return crossed
+
+    def speed_limits(self, centers, default_limit):
+        """
+        Speed limit and zone name for every centre.
+        First matching zone wins; tracks outside every zone get default_limit.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        limits = np.full(len(centers), float(default_limit))
+        names = np.full(len(centers), None, dtype=object)
+        unassigned = np.ones(len(centers), dtype=bool)
+
+        for zone in self.speed_zones:
+            inside = points_in_polygon(centers, zone.polygon) & unassigned
+            limits[inside] = zone.speed_limit
+            names[inside] = zone.name
+            unassigned &= ~inside
+
+        return limits, names